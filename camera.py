@@ -0,0 +1,106 @@
+import math
+import geometry
+
+NEAR_FRACTION = .25  # the near plane sits this fraction of the way from the eye to the screen
+
+
+class Camera:
+    """
+    Projection shared by every object in the scene. The eye sits at
+    (width / 2, height / 2, eye_z) looking down the z axis, with the projection
+    screen at screen_z, so a point at depth z is scaled by
+    (eye_z - screen_z) / (eye_z - z) around the middle of the window. Clipping
+    at a fixed fraction of that distance caps the scale at 1 / near_fraction,
+    so nothing can blow up to an enormous size however far the camera zooms in.
+    """
+
+    def __init__(self, width: int or float, height: int or float, screen_z: int or float, eye_z: int or float,
+                 is_orthogonal: bool = False, near_fraction: float = NEAR_FRACTION) -> None:
+        self.width = width
+        self.height = height
+        self.screen_z = screen_z
+        self.eye_z = eye_z
+        self.is_orthogonal = is_orthogonal
+        self.near_fraction = near_fraction
+
+        self.revision = 0  # bumped whenever the camera moves, like Cube.revision
+
+    def resize(self, width: int or float, height: int or float) -> None:
+        self.width = width
+        self.height = height
+        self.revision += 1
+
+    def add_distance(self, dist: int or float) -> None:
+        """ Moves the eye and screen away from the scene together, so positive dist zooms out """
+        self.screen_z += dist
+        self.eye_z += dist
+        self.revision += 1
+
+    def eye(self) -> geometry.Vector:
+        return geometry.Vector(self.width / 2, self.height / 2, self.eye_z)
+
+    def near_z(self) -> float:
+        return self.eye_z - (self.eye_z - self.screen_z) * self.near_fraction
+
+    def project(self, points: [geometry.Vector]) -> [geometry.Point2]:
+        """ Projects a whole batch of points onto the screen in one pass """
+        if self.is_orthogonal:
+            return [geometry.Point2(point.x, point.y) for point in points]
+
+        cx = self.width / 2
+        cy = self.height / 2
+        e = self.eye_z
+        focal = e - self.screen_z
+        return [geometry.Point2((point.x - cx) * focal / (e - point.z) + cx,
+                                (point.y - cy) * focal / (e - point.z) + cy) for point in points]
+
+    def clip_polygon(self, corners: [geometry.Vector]) -> [geometry.Vector]:
+        """ Cuts away the part of a polygon beyond the near plane (Sutherland-Hodgman against one plane) """
+        near = self.near_z()
+        if self.is_orthogonal or all(corner.z <= near for corner in corners):
+            return corners
+
+        clipped = []
+        for i, corner in enumerate(corners):
+            previous = corners[i - 1]
+            if (corner.z <= near) != (previous.z <= near):
+                t = (near - previous.z) / (corner.z - previous.z)
+                clipped += [previous.plus(corner.minus(previous).times(t))]
+            if corner.z <= near:
+                clipped += [corner]
+        return clipped
+
+    def project_polygons(self, polygons: [[geometry.Vector]]) -> [[geometry.Point2]]:
+        """
+        Clips every polygon against the near plane, then projects all of their
+        corners in a single batch. Polygons entirely behind the near plane come
+        back empty.
+        """
+        clipped = [self.clip_polygon(corners) for corners in polygons]
+        points = self.project([corner for corners in clipped for corner in corners])
+
+        projected = []
+        start = 0
+        for corners in clipped:
+            projected += [points[start:start + len(corners)]]
+            start += len(corners)
+        return projected
+
+    def is_visible(self, center: geometry.Vector, radius: int or float) -> bool:
+        """ Returns False only if the bounding sphere is entirely outside the view frustum """
+        if self.is_orthogonal:
+            return -radius <= center.x <= self.width + radius and -radius <= center.y <= self.height + radius
+
+        if center.z - radius > self.near_z():
+            return False
+
+        # each side plane passes through the eye and one edge of the screen, with its normal pointing inwards
+        focal = self.eye_z - self.screen_z
+        dx = center.x - self.width / 2
+        dy = center.y - self.height / 2
+        dz = center.z - self.eye_z
+        for offset, half_size in ((dx, self.width / 2), (-dx, self.width / 2),
+                                  (dy, self.height / 2), (-dy, self.height / 2)):
+            if (offset * focal - dz * half_size) / math.hypot(focal, half_size) < -radius:
+                return False
+        return True
@@ -1,4 +1,5 @@
 import math
+import camera
 import geometry
 import collections
 
@@ -23,20 +24,20 @@ def face_center(points):
 
 class Cube:
     def __init__(self, x: int or float, y: int or float, z: int or float, length: int or float,
-                 center_to_screen_dist: int or float, center_to_eye_dist: int or float) -> None:
+                 camera: camera.Camera) -> None:
         self._x = x
         self._y = y
         self._z = z
 
         self.length = length
-        self.center_to_screen_dist = center_to_screen_dist
-        self.center_to_eye_dist = center_to_eye_dist
+        self.camera = camera
 
         self.orthogonal_points = {}
         self.orthogonal_faces = {}
 
-        self.perspective_points = {}
-        self.perspective_faces = {}  # will also have normal vectors, but won't use them
+        self.perspective_faces = {}  # clipped to the camera's near plane, empty while the cube is out of view
+
+        self.revision = 0  # bumped whenever the cube moves, so callers can tell when to redraw
 
         self._create_points()
 
@@ -49,10 +50,16 @@ class Cube:
     def get_z(self):
         return self._z
 
-    def add_distance(self, dist):
-        self.center_to_screen_dist += dist
-        self.center_to_eye_dist += dist
-        self._update_perspective_points()
+    def bounding_radius(self) -> float:
+        return self.length * math.sqrt(3) / 2
+
+    def is_visible(self) -> bool:
+        center = geometry.Vector(self._x, self._y, self._z)
+        return self.camera.is_visible(center, self.bounding_radius())
+
+    def update_projection(self) -> None:
+        """ Re-projects the cube, which has to happen after its camera moves """
+        self._update_faces()
 
     def change_center(self, new_center: geometry.Vector) -> None:
         x = self._x
@@ -72,7 +79,8 @@ class Cube:
         self._y = new_y
         self._z = new_z
 
-        self._update_perspective_points()
+        self.revision += 1
+        self._update_faces()
 
     def rotate(self, xy_coords: (int or float, int or float), rotate_xz: bool,
                rotate_yz: bool, rotate_xy: bool, position=(0, 0)):
@@ -135,11 +143,13 @@ class Cube:
                 self.orthogonal_points[point] = \
                     geometry.Vector(self._x + new_x, self._y + new_y, self.orthogonal_points[point].z)
 
-        self._update_perspective_points()
+        if xy_coords[0] or xy_coords[1]:  # rotating by (0, 0) leaves the cube where it was
+            self.revision += 1
+        self._update_faces()
 
     def _create_points(self):
         self._create_orthogonal_points()  # have to do first
-        self._update_perspective_points()
+        self._update_faces()
 
     def _create_orthogonal_points(self):
         x = self._x
@@ -155,32 +165,18 @@ class Cube:
                                   'G': geometry.Vector(x + s / 2, y - s / 2, z - s / 2),  # G
                                   'H': geometry.Vector(x - s / 2, y - s / 2, z - s / 2)}  # H
 
-    def _update_perspective_points(self):
-        for i, key in enumerate(self.orthogonal_points):
-            orthogonal_point = self.orthogonal_points[key]
-            perspective_point = self.orthogonal_to_perspective(orthogonal_point)
-            self.perspective_points.update({key: perspective_point})
-        self._update_faces()
-
-    def orthogonal_to_perspective(self, point):
-        x = point.x - self._x
-        y = point.y - self._y
-        z = point.z - self._z
-
-        e = self.center_to_eye_dist
-        p = self.center_to_screen_dist
-        scale = (e - p) / (e - z)
-
-        return geometry.Point2(x * scale + self._x, y * scale + self._y)
-
     def _update_faces(self):
         face_keys = ['CBAD', 'CDEF', 'GFEH', 'GHAB', 'HEDA', 'BCFG']  # orthogonal_faces keys = perspective_faces keys
         for key in face_keys:
             orthogonal_face = self._face_key_to_orthogonal_face(key)
             self.orthogonal_faces.update({key: orthogonal_face})
 
-            perspective_face = self._face_key_to_perspective_face(key)
-            self.perspective_faces.update({key: perspective_face})
+        if self.is_visible():
+            # all six faces go through the camera in one batch
+            corners = self.camera.project_polygons([self.orthogonal_faces[key].corners for key in face_keys])
+            self.perspective_faces = {key: PerspectiveFace(corners[i]) for i, key in enumerate(face_keys)}
+        else:
+            self.perspective_faces = {key: PerspectiveFace([]) for key in face_keys}
 
         self._sort_faces_keys(face_keys, 0, len(face_keys) - 1)
         self.orthogonal_faces = {key: self.orthogonal_faces[key] for key in face_keys}
@@ -194,13 +190,6 @@ class Cube:
         center = face_center(points)
         return geometry.Face(points, center)
 
-    def _face_key_to_perspective_face(self, faces_key: str):
-        points = []
-        for char in faces_key:
-            point = self.perspective_points[char]
-            points += [point]
-        return PerspectiveFace(points)
-
     def _sort_faces_keys(self, faces_keys: [str], low: int, high: int) -> None:
         """ From https://www.geeksforgeeks.org/python-program-for-quicksort/ """
         if low < high:
@@ -0,0 +1,30 @@
+import pygame
+
+
+class FrameGovernor:
+    """
+    Decides when the main loop should draw. A frame is drawn only when the
+    scene's revision differs from the last one drawn (or after invalidate()),
+    at no more than target_fps. Otherwise the loop sleeps until input arrives.
+    """
+
+    def __init__(self, target_fps: int) -> None:
+        self.target_fps = target_fps
+        self._clock = pygame.time.Clock()
+        self._drawn_revision = None
+
+    def invalidate(self) -> None:
+        """ Forces the next frame to be drawn, e.g. after the window was exposed or resized """
+        self._drawn_revision = None
+
+    def needs_redraw(self, revision) -> bool:
+        return revision != self._drawn_revision
+
+    def frame_drawn(self, revision) -> None:
+        """ Records the revision just drawn and waits out the rest of the frame """
+        self._drawn_revision = revision
+        self._clock.tick(self.target_fps)
+
+    def wait_for_input(self) -> None:
+        """ Blocks until an event arrives, then puts it back for the usual event handling """
+        pygame.event.post(pygame.event.wait())
@@ -0,0 +1,57 @@
+import collections
+
+ORIENTATION_STEPS = 16  # orientations closer than 1 / ORIENTATION_STEPS of a side share a sprite
+AXIS_STEPS = 20  # cubes seen within 1 / AXIS_STEPS radians or so of each other share a sprite
+
+
+def orientation_key(cube, steps: int = ORIENTATION_STEPS) -> tuple:
+    """ Quantized positions of three corners relative to the center, which pin down the cube's orientation """
+    key = []
+    for corner in 'ABD':
+        point = cube.orthogonal_points[corner]
+        key += [round((point.x - cube.get_x()) / cube.length * steps),
+                round((point.y - cube.get_y()) / cube.length * steps),
+                round((point.z - cube.get_z()) / cube.length * steps)]
+    return tuple(key)
+
+
+def axis_offset_key(cube, camera, steps: int = AXIS_STEPS) -> (int, int):
+    """
+    Quantized direction from the camera axis to the cube. In perspective the
+    camera projects around the middle of the window, so the same cube looks
+    skewed differently depending on how far off that axis it sits.
+    """
+    eye_dist = camera.eye_z - cube.get_z()
+    return (round((cube.get_x() - camera.width / 2) / eye_dist * steps),
+            round((cube.get_y() - camera.height / 2) / eye_dist * steps))
+
+
+class ImpostorCache:
+    """
+    Least recently used cache of pre-rendered sprites, evicting the oldest
+    ones once their pixels take up more than max_bytes.
+    """
+
+    def __init__(self, max_bytes: int) -> None:
+        self.max_bytes = max_bytes
+        self._sprites = collections.OrderedDict()  # key -> (sprite, bytes), least recently used first
+        self._bytes = 0
+
+    def get(self, key):
+        if key not in self._sprites:
+            return None
+        self._sprites.move_to_end(key)
+        return self._sprites[key][0]
+
+    def put(self, key, sprite) -> None:
+        size = sprite.get_pitch() * sprite.get_height()
+        if size > self.max_bytes:
+            return
+
+        if key in self._sprites:
+            self._bytes -= self._sprites.pop(key)[1]
+        self._sprites[key] = (sprite, size)
+        self._bytes += size
+
+        while self._bytes > self.max_bytes:
+            self._bytes -= self._sprites.popitem(last=False)[1][1]
@@ -0,0 +1,136 @@
+import collections
+
+Pick = collections.namedtuple('Pick', ['obj', 'face_key', 'face'])
+GridEntry = collections.namedtuple('GridEntry', ['obj', 'face_key', 'face', 'cells', 'depth'])
+CELL_SIZE = 64  # pixels per grid cell, roughly the size of a face on screen
+
+
+def polygon_bounds(corners) -> (float, float, float, float):
+    """ Returns (left, top, right, bottom) of the smallest screen rectangle around corners """
+    xs = [corner.x for corner in corners]
+    ys = [corner.y for corner in corners]
+    return min(xs), min(ys), max(xs), max(ys)
+
+
+def point_in_polygon(x: int or float, y: int or float, corners) -> bool:
+    """ Even-odd ray casting test. Works for any simple polygon, convex or not. """
+    inside = False
+    j = len(corners) - 1
+    for i in range(len(corners)):
+        xi, yi = corners[i].x, corners[i].y
+        xj, yj = corners[j].x, corners[j].y
+        if (yi > y) != (yj > y) and x < (xj - xi) * (y - yi) / (yj - yi) + xi:
+            inside = not inside
+        j = i
+    return inside
+
+
+class SpatialGrid:
+    """
+    Uniform screen-space grid over the bounds of projected faces, used to find
+    which face of which object is under a point. A face is only re-binned when
+    the range of cells it covers changes, so updating an object that barely
+    moved touches almost nothing. Only cells inside the screen are kept, since
+    nothing off screen can be picked.
+    """
+
+    def __init__(self, screen_size: (int, int), cell_size: int = CELL_SIZE) -> None:
+        self.screen_size = screen_size
+        self.cell_size = cell_size
+        self._cells = {}  # (col, row) -> set of entry keys
+        self._entries = {}  # (id(obj), face_key) -> GridEntry
+        self._objects = {}  # id(obj) -> (obj, set of face keys), keeps obj alive so its id stays unique
+
+    def resize(self, screen_size: (int, int)) -> None:
+        """ Re-bins every face against the new screen edges, dropping the ones now off screen """
+        self.screen_size = screen_size
+        self._cells = {}
+        for key, entry in list(self._entries.items()):
+            cells = self._cell_range(polygon_bounds(entry.face.corners))
+            if cells is None:
+                del self._entries[key]
+                self._objects[key[0]][1].discard(entry.face_key)
+            else:
+                self._bin(key, cells)
+                self._entries[key] = entry._replace(cells=cells)
+
+    def update(self, obj, faces: dict, layer: int = 0) -> None:
+        """
+        Indexes the projected faces of obj. faces must be ordered back to front,
+        like Cube.perspective_faces, and objects with a higher layer are drawn on top.
+        """
+        obj_id = id(obj)
+        old_keys = self._objects.get(obj_id, (obj, set()))[1]
+        new_keys = set()
+
+        for depth, (face_key, face) in enumerate(faces.items()):
+            if len(face.corners) < 3:
+                continue
+
+            cells = self._cell_range(polygon_bounds(face.corners))
+            if cells is None:  # entirely off screen, so it can't be picked
+                continue
+
+            key = (obj_id, face_key)
+            old_entry = self._entries.get(key)
+            if old_entry is None or old_entry.cells != cells:
+                if old_entry is not None:
+                    self._unbin(key, old_entry.cells)
+                self._bin(key, cells)
+
+            self._entries[key] = GridEntry(obj, face_key, face, cells, (layer, depth))
+            new_keys.add(face_key)
+
+        for face_key in old_keys - new_keys:
+            key = (obj_id, face_key)
+            self._unbin(key, self._entries.pop(key).cells)
+
+        self._objects[obj_id] = (obj, new_keys)
+
+    def remove(self, obj) -> None:
+        obj_id = id(obj)
+        if obj_id in self._objects:
+            for face_key in self._objects.pop(obj_id)[1]:
+                key = (obj_id, face_key)
+                self._unbin(key, self._entries.pop(key).cells)
+
+    def pick(self, x: int or float, y: int or float) -> Pick or None:
+        """ Returns the topmost face containing (x, y), or None if there isn't one """
+        best = None
+        for key in self._cells.get((int(x // self.cell_size), int(y // self.cell_size)), ()):
+            entry = self._entries[key]
+            if best is not None and entry.depth < best.depth:
+                continue
+            if point_in_polygon(x, y, entry.face.corners):
+                best = entry
+
+        if best is None:
+            return None
+        return Pick(best.obj, best.face_key, best.face)
+
+    def _cell_range(self, bounds: (float, float, float, float)) -> (int, int, int, int) or None:
+        """ Cells covered by bounds, clamped to the screen, or None if they're all off screen """
+        left, top, right, bottom = bounds
+        size = self.cell_size
+        first_col = max(int(left // size), 0)
+        first_row = max(int(top // size), 0)
+        last_col = min(int(right // size), (self.screen_size[0] - 1) // size)
+        last_row = min(int(bottom // size), (self.screen_size[1] - 1) // size)
+        if first_col > last_col or first_row > last_row:
+            return None
+        return first_col, first_row, last_col, last_row
+
+    def _bin(self, key, cells: (int, int, int, int)) -> None:
+        first_col, first_row, last_col, last_row = cells
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                self._cells.setdefault((col, row), set()).add(key)
+
+    def _unbin(self, key, cells: (int, int, int, int)) -> None:
+        first_col, first_row, last_col, last_row = cells
+        for col in range(first_col, last_col + 1):
+            for row in range(first_row, last_row + 1):
+                cell = self._cells[(col, row)]
+                cell.discard(key)
+                if not cell:
+                    del self._cells[(col, row)]
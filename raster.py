@@ -0,0 +1,90 @@
+import multiprocessing
+from multiprocessing import shared_memory
+import pygame
+
+TILE_SIZE = 128  # pixels per side of a screen tile, one worker task per non-empty tile
+
+_attached = {}  # worker side: shared memory name -> (SharedMemory, Surface over its buffer)
+
+
+def _attached_surface(name: str, size: (int, int)):
+    """ Returns a Surface drawing straight into the named framebuffer, dropping any older one """
+    if name not in _attached:
+        for old_name in list(_attached):
+            shm, surface = _attached.pop(old_name)
+            del surface  # the surface holds a view of shm.buf, which has to go before closing
+            shm.close()
+        shm = shared_memory.SharedMemory(name=name)
+        _attached[name] = (shm, pygame.image.frombuffer(shm.buf, size, 'RGBA'))
+    return _attached[name][1]
+
+
+def _rasterize_tile(task) -> None:
+    name, size, clip, polygons = task
+    surface = _attached_surface(name, size)
+    surface.set_clip(clip)
+    for color, points in polygons:
+        pygame.draw.polygon(surface, color, points)
+
+
+class TileRasterizer:
+    """
+    Draws polygons into a framebuffer in shared memory. Each frame's polygons
+    are binned into screen tiles, and the tiles are drawn in parallel by a pool
+    of worker processes, each clipped to its own tile. The framebuffer is
+    exposed as surface, which can be blitted without copying it out first.
+    """
+
+    def __init__(self, size: (int, int), tile_size: int = TILE_SIZE, processes: int = None) -> None:
+        self.tile_size = tile_size
+        # wraps the shared memory without keeping it alive, so it's only valid until the next
+        # resize() or close(), and callers must drop their references to it before either
+        self.surface = None
+        self._shm = None
+        self._size = None
+        self.resize(size)  # first, so the workers share the resource tracker it starts
+        self._pool = multiprocessing.Pool(processes)
+
+    def resize(self, size: (int, int)) -> None:
+        self._release()
+        width, height = max(int(size[0]), 1), max(int(size[1]), 1)
+        self._shm = shared_memory.SharedMemory(create=True, size=width * height * 4)
+        self._size = (width, height)
+        self.surface = pygame.image.frombuffer(self._shm.buf, self._size, 'RGBA')
+
+    def clear(self) -> None:
+        self.surface.fill((0, 0, 0, 0))
+
+    def rasterize(self, polygons: [((int, int, int, int), [(float, float)])]) -> None:
+        """ Draws (color, points) polygons in order, the same as drawing them one by one """
+        width, height = self._size
+        size = self.tile_size
+        last_col = (width - 1) // size
+        last_row = (height - 1) // size
+
+        tiles = {}
+        for color, points in polygons:
+            xs = [point[0] for point in points]
+            ys = [point[1] for point in points]
+            first_col, first_row = max(int(min(xs)) // size, 0), max(int(min(ys)) // size, 0)
+            end_col, end_row = min(int(max(xs)) // size, last_col), min(int(max(ys)) // size, last_row)
+
+            for col in range(first_col, end_col + 1):
+                for row in range(first_row, end_row + 1):
+                    tiles.setdefault((col, row), []).append((color, points))
+
+        tasks = [(self._shm.name, self._size, (col * size, row * size, size, size), tile_polygons)
+                 for (col, row), tile_polygons in tiles.items()]
+        self._pool.map(_rasterize_tile, tasks)
+
+    def close(self) -> None:
+        self._pool.close()
+        self._pool.join()
+        self._release()
+
+    def _release(self) -> None:
+        if self._shm is not None:
+            self.surface = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
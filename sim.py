@@ -1,6 +1,10 @@
 import pygame
+import camera
 import cubes
+import frames
 import geometry
+import impostors
+import picking
 import math
 import collections
 
@@ -12,6 +16,7 @@ SIDE = 200
 SCREEN_DIST = SIDE / math.sqrt(2) + 1
 EYE_DIST = SCREEN_DIST + 2 * SIDE  # the bigger it is, the closer to no perspective, best around SCREEN_DIST + SIDE
 DOT_SIZE = 5
+TARGET_FPS = 60  # cap while animating, nothing is drawn while the scene is still
 
 BLACK = 0, 0, 0
 WHITE = 255, 255, 255
@@ -25,52 +30,82 @@ ORANGE = 255, 122, 0
 BACKGROUND_COLOR = ORANGE
 
 IS_ORTHOGONAL = False
-MIN_DISTANCE = -50
 CHANGE_DIST = 50
 
 COLORING = True
 SHADING = True
+PARALLEL_SHADING = False  # rasterize the shading overlay in tiles across worker processes
 
 DIVISOR = 10
 LIGHT_VECTOR = geometry.Vector(0, 0, 1)
 
+IMPOSTOR_SIZE = 64  # cubes smaller than this on screen, in pixels, are drawn from cached sprites
+IMPOSTOR_CACHE_BYTES = 16 * 1024 * 1024
 
-def get_face_points(face):
+
+def get_face_points(face, offset=(0, 0)):
     corners = []
     for corner in face.corners:
-        corners += [(corner.x, corner.y)]
+        corners += [(corner.x - offset[0], corner.y - offset[1])]
     return corners
 
 
 class Simulation3D:
     def __init__(self):
         self._running = True
-        self._cube = cubes.Cube(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, 0, SIDE, SCREEN_DIST, EYE_DIST)
+        self._camera = camera.Camera(SCREEN_WIDTH, SCREEN_HEIGHT, SCREEN_DIST, EYE_DIST, IS_ORTHOGONAL)
+        self._cube = cubes.Cube(SCREEN_WIDTH / 2, SCREEN_HEIGHT / 2, 0, SIDE, self._camera)
         self._clock = pygame.time.Clock()
+        self._governor = frames.FrameGovernor(TARGET_FPS)
         self._angle = 0
         self._this_rel = (0, 0)
         self._since_last_rel = (0, 0)
         self._screen_size = (SCREEN_WIDTH, SCREEN_HEIGHT)
         self._trans_surface = None
+        self._picker = picking.SpatialGrid(self._screen_size)
+        self._rasterizer = None
+        self._impostors = impostors.ImpostorCache(IMPOSTOR_CACHE_BYTES)
 
     def run(self):
         pygame.init()
 
         self._this_rel = pygame.mouse.get_rel()
         self._resize_surface()
+        if PARALLEL_SHADING:
+            import raster  # needs multiprocessing.shared_memory, only there from Python 3.8 on
+            self._rasterizer = raster.TileRasterizer(self._screen_size)
         self._running = True
 
-        while self._running:
-            # self._clock.tick(1000000)
-            self._handle_events()
-            self._handle_mouse_clicks()
+        try:
+            while self._running:
+                self._handle_events()
+                self._handle_mouse_clicks()
 
-            self._handle_keys()
-            self._redraw()
-        pygame.quit()
+                self._handle_keys()
+                if not self._running:
+                    break
+
+                revision = (self._cube.revision, self._camera.revision)
+                if self._governor.needs_redraw(revision):
+                    self._redraw()
+                    self._governor.frame_drawn(revision)
+                else:
+                    self._governor.wait_for_input()
+        finally:
+            if self._rasterizer is not None:
+                self._trans_surface = None  # it points into the shared memory close() frees
+                self._rasterizer.close()
+                self._rasterizer = None
+            pygame.quit()
 
     def _resize_surface(self) -> None:
         pygame.display.set_mode(self._screen_size, pygame.RESIZABLE)
+        self._governor.invalidate()  # set_mode hands back a blank surface
+        if self._rasterizer is not None:
+            self._trans_surface = None  # it points into the shared memory resize() frees
+            self._rasterizer.resize(self._screen_size)
+        self._camera.resize(self._screen_size[0], self._screen_size[1])
+        self._picker.resize(self._screen_size)
         self._cube.change_center(geometry.Vector(self._screen_size[0] / 2, self._screen_size[1] / 2, 0))
 
     def _handle_events(self) -> None:
@@ -82,6 +117,9 @@ class Simulation3D:
                 self._screen_size = event.size
                 self._resize_surface()
 
+            elif event.type == pygame.VIDEOEXPOSE:
+                self._governor.invalidate()
+
             elif event.type == pygame.KEYDOWN:
                 if event.key == pygame.K_a:
                     self._cube.rotate((self._cube.length / math.sqrt(2), 0), True, False, False)
@@ -113,13 +151,15 @@ class Simulation3D:
         if pygame.key.get_pressed()[pygame.K_j]:
             self._cube.rotate((circle_magnitude, circle_magnitude), False, False, True)
 
-        if pygame.key.get_pressed()[pygame.K_n] and self._cube.center_to_screen_dist >= MIN_DISTANCE + CHANGE_DIST:
-            # zoom in
-            self._cube.add_distance(-CHANGE_DIST)
+        if pygame.key.get_pressed()[pygame.K_n]:
+            # zoom in, the camera clips whatever ends up behind the eye
+            self._camera.add_distance(-CHANGE_DIST)
+            self._cube.update_projection()
 
         if pygame.key.get_pressed()[pygame.K_m]:
             # zoom out
-            self._cube.add_distance(CHANGE_DIST)
+            self._camera.add_distance(CHANGE_DIST)
+            self._cube.update_projection()
 
         self._handle_events()
 
@@ -127,8 +167,13 @@ class Simulation3D:
         if pygame.mouse.get_pressed()[0]:
             mouse_pos = pygame.mouse.get_pos()
             mx, my = mouse_pos[0], mouse_pos[1]
-            x, y = self._cube.get_x(), self._cube.get_y()
-            max_length = self._cube.length / math.sqrt(2)
+
+            # tumble when grabbing the cube itself, spin when grabbing the space around it
+            if self._cube.is_visible():
+                self._picker.update(self._cube, self._projected_faces())
+            else:
+                self._picker.remove(self._cube)
+            grabbed_cube = self._picker.pick(mx, my) is not None
 
             # move from where mouse was 1/7s ago to where it is now
             pygame.mouse.get_rel()
@@ -137,7 +182,7 @@ class Simulation3D:
             self._this_rel = pygame.mouse.get_rel()
             self._this_rel = -self._this_rel[0], self._this_rel[1]
 
-            if x - max_length < mx < x + max_length and y - max_length < my < y + max_length:
+            if grabbed_cube:
                 self._cube.rotate(self._this_rel, True, True, False)
             else:
                 self._cube.rotate(self._this_rel, False, False, True, mouse_pos)
@@ -147,46 +192,84 @@ class Simulation3D:
     def _redraw(self):
         surface = pygame.display.get_surface()
         surface.fill(BACKGROUND_COLOR)
-        self._trans_surface = pygame.Surface(self._screen_size, pygame.SRCALPHA)
-
-        self._draw_cube(COLORING, SHADING)
+        if self._rasterizer is None:
+            self._trans_surface = pygame.Surface(self._screen_size, pygame.SRCALPHA)
+        else:
+            self._rasterizer.clear()
+            self._trans_surface = self._rasterizer.surface
+
+        # culled cubes skip all per-face work
+        corners = [corner for face in self._projected_faces().values() for corner in face.corners]
+        if self._cube.is_visible() and corners:
+            left, top, right, bottom = picking.polygon_bounds(corners)
+            if max(right - left, bottom - top) < IMPOSTOR_SIZE:
+                self._draw_impostor(surface, (left, top, right, bottom))
+            else:
+                self._draw_cube(surface, self._trans_surface, COLORING, SHADING)
 
         surface.blit(self._trans_surface, (0, 0))
         pygame.display.flip()
 
-    def _draw_cube(self, coloring, shading):
-        surface = pygame.display.get_surface()
+    def _projected_faces(self):
+        if self._camera.is_orthogonal:
+            return self._cube.orthogonal_faces
+        else:
+            return self._cube.perspective_faces
 
-        if IS_ORTHOGONAL:
-            faces = self._cube.orthogonal_faces
+    def _draw_impostor(self, surface, bounds):
+        """ Blits the cube from a cached sprite, rendering the sprite first if there's none for this look """
+        left, top, right, bottom = bounds
+        if self._camera.is_orthogonal:
+            perspective = None
         else:
-            faces = self._cube.perspective_faces
+            perspective = (round((self._camera.eye_z - self._cube.get_z()) / self._cube.length, 1),
+                           impostors.axis_offset_key(self._cube, self._camera))
+        key = (impostors.orientation_key(self._cube), round(max(right - left, bottom - top)), perspective,
+               COLORING, SHADING, DIVISOR)
+        offset = (math.floor(left) - 1, math.floor(top) - 1)
+
+        sprite = self._impostors.get(key)
+        if sprite is None:
+            size = (math.ceil(right) - offset[0] + 1, math.ceil(bottom) - offset[1] + 1)
+            sprite = pygame.Surface(size, pygame.SRCALPHA)
+            sprite_shading = pygame.Surface(size, pygame.SRCALPHA)
+            self._draw_cube(sprite, sprite_shading, COLORING, SHADING, offset)
+            sprite.blit(sprite_shading, (0, 0))
+            self._impostors.put(key, sprite)
+
+        surface.blit(sprite, offset)
+
+    def _draw_cube(self, surface, trans_surface, coloring, shading, offset=(0, 0)):
+        faces = self._projected_faces()
 
         if coloring:
             for key in faces:
+                if len(faces[key].corners) < 3:  # clipped away by the near plane
+                    continue
+
                 if key == 'CBAD':
-                    pygame.draw.polygon(surface, RED, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, RED, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
                 elif key == 'CDEF':
-                    pygame.draw.polygon(surface, GREEN, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, GREEN, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
                 elif key == 'GFEH':
-                    pygame.draw.polygon(surface, BLUE, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, BLUE, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
                 elif key == 'GHAB':
-                    pygame.draw.polygon(surface, YELLOW, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, YELLOW, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
                 elif key == 'HEDA':
-                    pygame.draw.polygon(surface, MAGENTA, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, MAGENTA, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
                 elif key == 'BCFG':
-                    pygame.draw.polygon(surface, CYAN, get_face_points(faces[key]))
-                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key]))
+                    pygame.draw.polygon(surface, CYAN, get_face_points(faces[key], offset))
+                    pygame.draw.lines(surface, BLACK, True, get_face_points(faces[key], offset))
 
         if shading:
-            self._draw_shading(DIVISOR)
+            self._draw_shading(trans_surface, DIVISOR, offset)
 
-    def _draw_shading(self, divisor: int):
+    def _draw_shading(self, trans_surface, divisor: int, offset=(0, 0)):
         faces = self._cube.orthogonal_faces
         all_sub_faces = {}
         keys = list(faces.keys())
@@ -214,7 +297,7 @@ class Simulation3D:
             d3 = sub_face_displacements[2]
             d4 = sub_face_displacements[3]
 
-            curr_sub_faces = []
+            o_sub_faces = []
             for i in range(divisor):
                 start = first_corner.minus(center).plus(d4.times(i))
                 for j in range(divisor):
@@ -224,35 +307,39 @@ class Simulation3D:
                     o_point4 = start.plus(d4).plus(center)
 
                     o_points = [o_point1, o_point2, o_point3, o_point4]
-                    o_sub_face = geometry.Face(o_points, cubes.face_center(o_points))
-
-                    p_point1 = self._cube.orthogonal_to_perspective(o_point1)
-                    p_point2 = self._cube.orthogonal_to_perspective(o_point2)
-                    p_point3 = self._cube.orthogonal_to_perspective(o_point3)
-                    p_point4 = self._cube.orthogonal_to_perspective(o_point4)
-                    p_sub_face = cubes.PerspectiveFace([p_point1, p_point2, p_point3, p_point4])
-
-                    curr_sub_faces += [SubFace(face, o_sub_face, p_sub_face)]
+                    o_sub_faces += [geometry.Face(o_points, cubes.face_center(o_points))]
                     start = start.plus(d2)
 
+            # project the whole face's sub faces in one batch
+            p_corners = self._camera.project_polygons([o_sub_face.corners for o_sub_face in o_sub_faces])
+            curr_sub_faces = [SubFace(face, o_sub_face, cubes.PerspectiveFace(p_corners[i]))
+                              for i, o_sub_face in enumerate(o_sub_faces)]
+
             all_sub_faces.update({key: curr_sub_faces})  # give all_sub_faces same keys as orthogonal_faces
 
-        surface = pygame.display.get_surface()
+        eye_vector = self._camera.eye()
+        polygons = []
         for curr_sub_faces in all_sub_faces.values():
             for sub_face in curr_sub_faces:
                 center_to_sub_face = cubes.face_center(sub_face.o.corners).minus(center)
                 alpha = center_to_sub_face.angle_between_vectors(LIGHT_VECTOR) * 255 / math.pi
 
-                if IS_ORTHOGONAL:
+                if self._camera.is_orthogonal:
                     if sub_face.o.normal_vector.z > 0:
-                        pygame.draw.polygon(self._trans_surface, (0, 0, 0, alpha), get_face_points(sub_face.o))
+                        polygons += [((0, 0, 0, alpha), get_face_points(sub_face.o, offset))]
                 else:
-                    eye_vector = geometry.Vector(center.x, center.y, center.z + self._cube.center_to_eye_dist)
                     face_center = cubes.face_center(sub_face.face.corners)
                     eye_to_face = face_center.minus(eye_vector)
 
-                    if sub_face.face.normal_vector.angle_between_vectors(eye_to_face) >= math.pi / 2:
-                        pygame.draw.polygon(self._trans_surface, (0, 0, 0, alpha), get_face_points(sub_face.p))
+                    if sub_face.face.normal_vector.angle_between_vectors(eye_to_face) >= math.pi / 2 and \
+                            len(sub_face.p.corners) >= 3:
+                        polygons += [((0, 0, 0, alpha), get_face_points(sub_face.p, offset))]
+
+        if self._rasterizer is not None and trans_surface is self._rasterizer.surface:
+            self._rasterizer.rasterize(polygons)
+        else:
+            for color, points in polygons:
+                pygame.draw.polygon(trans_surface, color, points)
 
     def _end_simulation(self):
         self._running = False